@@ -12,6 +12,7 @@ This is host-ready: uses async endpoints, simple JSON responses, and CORS enable
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
@@ -32,7 +33,11 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rag-backend")
 
 # import pipeline functions (these are async)
-from app.rag.pipeline import process_document, answer_query  # type: ignore
+from app.rag.pipeline import process_document_file, answer_query  # type: ignore
+
+# upload streaming: read this much per chunk, reject anything larger than the cap
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
 
 app = FastAPI(title="RAG Backend")
 
@@ -64,16 +69,31 @@ async def upload_file(file: UploadFile = File(...), document_id: str = Form(...)
     Upload endpoint:
     - file: multipart file field
     - document_id: a short unique id (string) you choose for this document
-    This endpoint reads file bytes and dispatches to process_document.
+    Streams the upload to a temp file in fixed-size chunks (so a large PDF is
+    never fully resident in RAM) and dispatches to process_document_file.
     """
+    tmp = tempfile.NamedTemporaryFile(
+        suffix=Path(file.filename or "upload").suffix, delete=False
+    )
     try:
-        contents = await file.read()
-        # run pipeline
-        result = await process_document(contents, file.filename, document_id)
+        total = 0
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            total += len(chunk)
+            if total > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="file too large")
+            tmp.write(chunk)
+        tmp.close()
+        # run pipeline from the on-disk copy
+        result = await process_document_file(tmp.name, file.filename, document_id)
         return {"status": "ok", "result": result}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error in /upload")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        tmp.close()
+        os.unlink(tmp.name)
 
 
 @app.post("/query")
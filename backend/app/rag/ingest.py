@@ -6,9 +6,18 @@ This is step 1 of the RAG pipeline.
 """
 
 import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
 import pdfplumber
 import docx
 
+# Parallel page extraction kicks in above this page count; below it the
+# thread-pool overhead isn't worth it.
+_PARALLEL_PAGE_THRESHOLD = 8
+
 def extract_text(file_bytes: bytes, filename: str) -> str:
     """
     Takes raw bytes from an uploaded file and returns plain text.
@@ -30,10 +39,74 @@ def extract_text(file_bytes: bytes, filename: str) -> str:
     return file_bytes.decode(errors="ignore")
 
 
-def extract_pdf(file_bytes: bytes) -> str:
-    """Reads a PDF file and extracts text using pdfplumber."""
+def extract_text_file(path: str, filename: str) -> str:
+    """
+    Path-based variant of extract_text for streamed uploads: PDFs are opened
+    straight from disk (MuPDF mmaps the file) so the whole upload never has
+    to sit in RAM. Other formats are small enough to read fully.
+    """
+    lower = filename.lower()
+
+    if lower.endswith(".pdf"):
+        return extract_pdf(path)
+
+    with open(path, "rb") as f:
+        return extract_text(f.read(), filename)
+
+
+def extract_pdf(source: "bytes | str") -> str:
+    """
+    Reads a PDF (from raw bytes or a filesystem path) and extracts text
+    using PyMuPDF (MuPDF's C parser), which is roughly an order of magnitude
+    faster than pdfplumber's pure-Python layout analysis. Falls back to
+    pdfplumber if MuPDF cannot parse the file.
+    """
+    try:
+        doc = _open_fitz(source)
+        try:
+            if doc.page_count <= _PARALLEL_PAGE_THRESHOLD:
+                return "\n".join(page.get_text("text") for page in doc)
+            return _extract_pdf_pages_parallel(source, doc.page_count)
+        finally:
+            doc.close()
+    except Exception:
+        return _extract_pdf_pdfplumber(source)
+
+
+def _open_fitz(source: "bytes | str"):
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _extract_pdf_pages_parallel(source: "bytes | str", page_count: int) -> str:
+    """
+    Extract pages concurrently. MuPDF releases the GIL inside its C parser,
+    so threads overlap real decode work. A fitz document is not safe to
+    share across threads, so each worker opens its own document over the
+    same source (cheap: MuPDF parses pages lazily).
+    """
+    local = threading.local()
+
+    def _page_text(i: int) -> str:
+        doc = getattr(local, "doc", None)
+        if doc is None:
+            doc = _open_fitz(source)
+            local.doc = doc
+        return doc.load_page(i).get_text("text")
+
+    max_workers = min(os.cpu_count() or 1, page_count)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        # map preserves page order
+        parts = list(ex.map(_page_text, range(page_count)))
+    return "\n".join(parts)
+
+
+def _extract_pdf_pdfplumber(source: "bytes | str") -> str:
+    """Slower pdfplumber fallback (kept for PDFs MuPDF rejects)."""
     text_parts = []
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+    opened = source if isinstance(source, str) else io.BytesIO(source)
+    with pdfplumber.open(opened) as pdf:
         for page in pdf.pages:
             text_parts.append(page.extract_text() or "")
     return "\n".join(text_parts)
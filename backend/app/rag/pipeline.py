@@ -15,11 +15,107 @@ so you can wire an LLM of your choice later in the pipeline.
 
 from typing import List, Tuple, Dict, Any, Optional
 import asyncio
+import json
+import logging
+import os
 
-from .ingest import extract_text
+import boto3
+from botocore.exceptions import ClientError, BotoCoreError
+
+from .ingest import extract_text, extract_text_file
 from .splitter import split_text_to_chunks
-from .embeddings import embed_texts
-from .vectorstore import upsert_embeddings, query_similar
+from .embeddings import embed_texts_np
+from .vectorstore import upsert_embeddings, query_similar_async
+
+logger = logging.getLogger("rag-backend")
+
+# The embed and upsert stages batch independently: small micro-batches keep
+# the transformer fed and results flowing, while the upsert consumer packs
+# them into larger DB batches so each Supabase round trip carries more rows.
+# The bounded queue between them gives backpressure if the DB falls behind.
+EMBED_MICRO_BATCH = int(os.getenv("EMBED_MICRO_BATCH", "128"))
+UPSERT_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "500"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Prompt template bound once at import; answer_query just calls the bound
+# str.format instead of rebuilding the instruction text per request.
+_PROMPT_TMPL = (
+    "You are a helpful assistant. Use ONLY the provided context to answer the question. "
+    "Do not hallucinate. If the answer cannot be found in the provided context, "
+    "explicitly state that you cannot answer based on the given context.\n\n"
+    "CONTEXT:\n{ctx}\n\n"
+    "QUESTION: {q}\n\n"
+    "Answer concisely based solely on the provided context."
+).format
+
+# Cached Bedrock runtime client: boto3 clients hold a urllib3 connection
+# pool, so reusing one turns each LLM call into a single round trip instead
+# of paying TCP+TLS handshake per query.
+_bedrock_client = None
+
+
+def _get_bedrock_client():
+    """Create (once) and return the Bedrock runtime client."""
+    global _bedrock_client
+    if _bedrock_client is None:
+        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
+        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        aws_region = os.getenv("AWS_REGION")
+
+        if not aws_access_key_id or not aws_secret_access_key:
+            raise RuntimeError("AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY must be set in environment.")
+        if not aws_region:
+            raise RuntimeError("AWS_REGION must be set in environment.")
+
+        _bedrock_client = boto3.client(
+            "bedrock-runtime",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            region_name=aws_region,
+        )
+    return _bedrock_client
+
+
+def _call_bedrock_sync(prompt: str) -> str:
+    """Synchronous Bedrock inference call reusing the cached client."""
+    model_id = os.getenv("BEDROCK_MODEL_ID", "amazon.titan-text-express-v1")
+    bedrock_runtime = _get_bedrock_client()
+
+    # Prepare request body for Titan model
+    body = json.dumps({
+        "inputText": prompt,
+        "textGenerationConfig": {
+            "maxTokenCount": 512,
+            "temperature": 0.2,
+            "topP": 0.9
+        }
+    })
+
+    try:
+        # Invoke model
+        response = bedrock_runtime.invoke_model(
+            modelId=model_id,
+            body=body,
+            contentType="application/json",
+            accept="application/json"
+        )
+
+        # Parse response
+        response_body = json.loads(response["body"].read())
+
+        # Extract generated text from Titan response
+        if "results" in response_body and len(response_body["results"]) > 0:
+            generated_text = response_body["results"][0].get("outputText", "").strip()
+            return generated_text
+        else:
+            raise RuntimeError(f"Unexpected Bedrock response format: {response_body}")
+
+    except ClientError as e:
+        error_code = e.response.get("Error", {}).get("Code", "Unknown")
+        error_message = e.response.get("Error", {}).get("Message", str(e))
+        raise RuntimeError(f"Bedrock ClientError ({error_code}): {error_message}")
+    except BotoCoreError as e:
+        raise RuntimeError(f"Bedrock BotoCoreError: {str(e)}")
 
 
 async def process_document(
@@ -35,35 +131,130 @@ async def process_document(
     Steps:
     1) extract raw text from bytes
     2) split into chunks (list of dicts with chunk_id/text)
-    3) embed chunk texts
-    4) upsert into Supabase table (idempotent by document_id)
+    3) embed chunk texts and upsert into Supabase as a two-stage pipeline:
+       batches of chunks are embedded while the previous batch's network
+       write is in flight, connected by a bounded asyncio.Queue so the
+       embed stage backs off if Supabase falls behind.
 
     Returns a summary dict: {"document_id": ..., "num_chunks": n, "inserted": x}
     """
 
     # 1) extract text (IO / CPU bound) -> run in thread
     text = await asyncio.to_thread(extract_text, file_bytes, filename)
+    return await _process_text(text, filename, document_id, chunk_size, overlap)
+
+
+async def process_document_file(
+    file_path: str,
+    filename: str,
+    document_id: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+) -> Dict[str, Any]:
+    """
+    Like process_document, but reads from a file on disk (e.g. a streamed
+    upload spooled to a temp file) so the raw bytes never have to be held
+    in memory alongside the parser's own structures.
+    """
+    text = await asyncio.to_thread(extract_text_file, file_path, filename)
+    return await _process_text(text, filename, document_id, chunk_size, overlap)
+
+
+async def _process_text(
+    text: str,
+    filename: str,
+    document_id: str,
+    chunk_size: int,
+    overlap: int,
+) -> Dict[str, Any]:
+    """Shared split -> embed -> upsert stage pipeline."""
 
     # 2) split into chunks (CPU bound but small) -> run in thread
     chunk_dicts = await asyncio.to_thread(split_text_to_chunks, text, chunk_size, overlap)
     # convert to simple list of chunk texts ordered by chunk_id
     chunks = [c["text"] for c in chunk_dicts]
 
-    # 3) embed chunks (sentence-transformers; can be heavy) -> run in thread
-    embeddings = await asyncio.to_thread(embed_texts, chunks)
+    if not chunks:
+        return {
+            "document_id": document_id,
+            "num_chunks": 0,
+            "inserted": 0,
+            "requested": 0,
+        }
+
+    # 3+4) embed / upsert stage pipeline.
+    # queue items: (chunk_id_offset, chunk_texts, embeddings) or None sentinel
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    inserted = 0
 
-    # 4) upsert into supabase (network I/O) -> run in thread
-    # optional: attach per-chunk metadata (example: filename)
-    metadata = [{"filename": filename} for _ in chunks]
-    upsert_result = await asyncio.to_thread(
-        upsert_embeddings, document_id, chunks, embeddings, metadata, True
-    )
+    async def _upsert_stage() -> None:
+        nonlocal inserted
+        # first write deletes existing rows for this document_id (idempotency)
+        delete_existing = True
+        buf_offset = 0
+        buf_chunks: List[str] = []
+        buf_embeddings: List[Any] = []
+
+        async def _flush() -> None:
+            nonlocal inserted, delete_existing, buf_offset, buf_chunks, buf_embeddings
+            if not buf_chunks:
+                return
+            metadata = [{"filename": filename} for _ in buf_chunks]
+            result = await asyncio.to_thread(
+                upsert_embeddings,
+                document_id,
+                buf_chunks,
+                buf_embeddings,
+                metadata,
+                delete_existing,
+                buf_offset,
+            )
+            delete_existing = False
+            inserted += result.get("inserted", 0)
+            buf_chunks, buf_embeddings = [], []
+
+        while True:
+            item = await queue.get()
+            if item is None:
+                await _flush()
+                return
+            offset, batch_chunks, batch_embeddings = item
+            if not buf_chunks:
+                buf_offset = offset
+            buf_chunks.extend(batch_chunks)
+            buf_embeddings.extend(batch_embeddings)
+            # micro-batches arrive in order; pack them up to a full DB batch
+            if len(buf_chunks) >= UPSERT_BATCH_SIZE:
+                await _flush()
+
+    upsert_task = asyncio.create_task(_upsert_stage())
+
+    async def _put(item) -> None:
+        # put() can block on a full queue; if the upsert stage died we must
+        # not wait on a queue nobody drains, so race the put against the task.
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put, upsert_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+
+    try:
+        for offset in range(0, len(chunks), EMBED_MICRO_BATCH):
+            if upsert_task.done():
+                break  # upsert failed; surface its exception below
+            batch_chunks = chunks[offset : offset + EMBED_MICRO_BATCH]
+            batch_embeddings = await asyncio.to_thread(embed_texts_np, batch_chunks)
+            await _put((offset, batch_chunks, batch_embeddings))
+        await _put(None)
+        await upsert_task
+    finally:
+        if not upsert_task.done():
+            upsert_task.cancel()
 
     return {
         "document_id": document_id,
         "num_chunks": len(chunks),
-        "inserted": upsert_result.get("inserted", None),
-        "requested": upsert_result.get("requested", None),
+        "inserted": inserted,
+        "requested": len(chunks),
     }
 
 
@@ -75,118 +266,44 @@ async def answer_query(question: str, top_k: int = 2) -> Tuple[str, List[Dict[st
     
     Uses Amazon Bedrock Titan model for LLM inference.
     """
-    import os
-    import json
-    import logging
-    
     # Validate and cap top_k at maximum of 3
     top_k = min(top_k, 3)
     
     # 1) embed the question
-    q_emb_list = await asyncio.to_thread(embed_texts, [question])
+    q_emb_list = await asyncio.to_thread(embed_texts_np, [question])
     if not q_emb_list:
         return "No embedding produced for the query.", []
 
     q_emb = q_emb_list[0]
 
-    # 2) query supabase for similar chunks
-    hits = await asyncio.to_thread(query_similar, q_emb, top_k)
-
-    # 3) build combined context and sources
-    contexts = []
-    sources: List[Dict[str, Any]] = []
-    for h in hits:
-        # expected keys from RPC: id, document_id, chunk_id, chunk_text, score
-        chunk_text = h.get("chunk_text") or h.get("text") or ""
-        contexts.append(chunk_text)
-        sources.append({
+    # 2) query supabase for similar chunks (true async; no thread burned)
+    hits = await query_similar_async(q_emb, top_k)
+
+    # 3) build combined context and sources in one pass over hits
+    # expected keys from RPC: id, document_id, chunk_id, chunk_text, score
+    contexts = [h.get("chunk_text") or h.get("text") or "" for h in hits]
+    sources: List[Dict[str, Any]] = [
+        {
             "id": h.get("id"),
             "document_id": h.get("document_id"),
             "chunk_id": h.get("chunk_id"),
             "score": h.get("score"),
-            "text": chunk_text[:500]  # truncated preview
-        })
+            "text": chunk_text[:500],  # truncated preview
+        }
+        for h, chunk_text in zip(hits, contexts)
+    ]
 
     combined_context = "\n\n---\n\n".join(contexts).strip()
 
     # 4) Call Amazon Bedrock for LLM inference
     if combined_context:
-        def _call_bedrock_sync(prompt: str) -> str:
-            """Synchronous Bedrock inference call using boto3."""
-            import boto3
-            from botocore.exceptions import ClientError, BotoCoreError
-            
-            # Read AWS credentials from environment variables
-            aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-            aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            aws_region = os.getenv("AWS_REGION")
-            model_id = os.getenv("BEDROCK_MODEL_ID", "amazon.titan-text-express-v1")
-            
-            if not aws_access_key_id or not aws_secret_access_key:
-                raise RuntimeError("AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY must be set in environment.")
-            if not aws_region:
-                raise RuntimeError("AWS_REGION must be set in environment.")
-            
-            # Create Bedrock Runtime client
-            bedrock_runtime = boto3.client(
-                "bedrock-runtime",
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-                region_name=aws_region
-            )
-            
-            # Prepare request body for Titan model
-            body = json.dumps({
-                "inputText": prompt,
-                "textGenerationConfig": {
-                    "maxTokenCount": 512,
-                    "temperature": 0.2,
-                    "topP": 0.9
-                }
-            })
-            
-            try:
-                # Invoke model
-                response = bedrock_runtime.invoke_model(
-                    modelId=model_id,
-                    body=body,
-                    contentType="application/json",
-                    accept="application/json"
-                )
-                
-                # Parse response
-                response_body = json.loads(response["body"].read())
-                
-                # Extract generated text from Titan response
-                if "results" in response_body and len(response_body["results"]) > 0:
-                    generated_text = response_body["results"][0].get("outputText", "").strip()
-                    return generated_text
-                else:
-                    raise RuntimeError(f"Unexpected Bedrock response format: {response_body}")
-                    
-            except ClientError as e:
-                error_code = e.response.get("Error", {}).get("Code", "Unknown")
-                error_message = e.response.get("Error", {}).get("Message", str(e))
-                raise RuntimeError(f"Bedrock ClientError ({error_code}): {error_message}")
-            except BotoCoreError as e:
-                raise RuntimeError(f"Bedrock BotoCoreError: {str(e)}")
-        
-        # Construct prompt with explicit instruction
-        prompt = (
-            "You are a helpful assistant. Use ONLY the provided context to answer the question. "
-            "Do not hallucinate. If the answer cannot be found in the provided context, "
-            "explicitly state that you cannot answer based on the given context.\n\n"
-            f"CONTEXT:\n{combined_context}\n\n"
-            f"QUESTION: {question}\n\n"
-            "Answer concisely based solely on the provided context."
-        )
-        
+        prompt = _PROMPT_TMPL(ctx=combined_context, q=question)
+
         try:
             # Call Bedrock in a thread so async loop stays responsive
             answer = await asyncio.to_thread(_call_bedrock_sync, prompt)
         except Exception as e:
             # Log error and provide fallback
-            logger = logging.getLogger("rag-backend")
             logger.exception("Bedrock inference failed")
             answer = f"Unable to generate answer: {str(e)}"
     else:
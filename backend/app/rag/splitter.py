@@ -10,6 +10,8 @@ Functions:
 
 from typing import List, Dict
 
+import numpy as np
+
 def split_text_to_chunks(
     text: str,
     chunk_size: int = 1000,
@@ -28,19 +30,14 @@ def split_text_to_chunks(
     if overlap < 0:
         raise ValueError("overlap must be >= 0")
 
-    chunks: List[Dict] = []
-    text_len = len(text)
-    start = 0
-    chunk_id = 0
-
     # Effective step ensures progress; if overlap >= chunk_size, step becomes 1
     step = max(chunk_size - overlap, 1)
 
-    while start < text_len:
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        chunks.append({"chunk_id": chunk_id, "text": chunk_text})
-        chunk_id += 1
-        start += step
-
-    return chunks
+    # Precompute all start offsets in one numpy call instead of a Python
+    # while loop with per-iteration index arithmetic; slicing past the end
+    # of the string is safe and just truncates the final chunk.
+    starts = np.arange(0, len(text), step, dtype=np.int64)
+    return [
+        {"chunk_id": chunk_id, "text": text[start : start + chunk_size]}
+        for chunk_id, start in enumerate(starts.tolist())
+    ]
@@ -30,17 +30,56 @@ else:
 # ================================
 # Imports and config
 # ================================
+import httpx
+import numpy as np
 from supabase import create_client, Client
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "500"))
+# Use the insert_embeddings_bulk DB function (see backend/db/) when available;
+# falls back automatically to plain table inserts if the RPC is missing.
+USE_BULK_RPC = os.getenv("SUPABASE_BULK_RPC", "1") == "1"
+# Send embeddings as pgvector text literals ('[0.1,0.2,...]') instead of JSON
+# float arrays. Requires the embedding column to be a pgvector `vector` type
+# (it is, per match_vectors); set to 0 if the column is a plain float array.
+VECTOR_AS_TEXT = os.getenv("SUPABASE_VECTOR_TEXT", "1") == "1"
+# Set after running backend/db/halfvec_migration.sql: quantizes values to
+# fp16 before sending, matching what a halfvec column can store anyway and
+# shrinking literals further.
+HALF_PRECISION = os.getenv("SUPABASE_HALFVEC", "0") == "1"
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL or SUPABASE_KEY environment variables are required.")
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Flipped off for the process lifetime the first time the bulk RPC errors
+# (e.g. the function was never created in this database).
+_bulk_rpc_ok = True
+
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+# Shared async HTTP client for the query hot path. Created lazily so it binds
+# to the running event loop; keep-alive pooling means repeated queries reuse
+# one TCP+TLS connection instead of a thread + fresh handshake per call.
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            base_url=f"{SUPABASE_URL}/rest/v1",
+            headers={
+                "apikey": SUPABASE_KEY,
+                "Authorization": f"Bearer {SUPABASE_KEY}",
+                "Content-Type": "application/json",
+            },
+            timeout=SUPABASE_TIMEOUT,
+        )
+    return _async_client
+
 
 # -----------------------------
 # Helpers for robust response handling
@@ -112,6 +151,41 @@ def _resp_get_data_list(resp: Any) -> Optional[List]:
     return None
 
 
+# -----------------------------
+# INTERNAL: vector wire format
+# -----------------------------
+def _vector_literal(emb: List[float]) -> str:
+    """
+    Format an embedding as a pgvector text literal ('[0.1,0.2,...]').
+
+    Formatting the float32 scalars directly gives the shortest repr that
+    round-trips at the precision pgvector actually stores (float4, ~9
+    significant digits vs ~17 for float64), roughly halving bytes on the
+    wire versus a JSON array of float64 reprs, and PostgREST hands the whole
+    string to pgvector's parser instead of walking a 768-element array.
+
+    With SUPABASE_HALFVEC=1 values are additionally rounded through fp16 —
+    the storage precision of a halfvec column — which shortens reprs further.
+    """
+    arr = np.asarray(emb, dtype=np.float32)
+    if HALF_PRECISION:
+        arr = arr.astype(np.float16).astype(np.float32)
+    # str() on the np.float32 scalars themselves; .tolist() would widen to
+    # float64 and bring the long reprs right back
+    return "[" + ",".join(map(str, arr)) + "]"
+
+
+def _vector_value(emb) -> "str | List[float]":
+    """
+    Serialize one embedding row for the wire. Accepts a float32 numpy row
+    (the zero-copy path from embed_texts_np — asarray adds no copy) or a
+    plain list of floats.
+    """
+    if VECTOR_AS_TEXT:
+        return _vector_literal(emb)
+    return emb.tolist() if isinstance(emb, np.ndarray) else emb
+
+
 # -----------------------------
 # INTERNAL: chunked iterable
 # -----------------------------
@@ -126,9 +200,10 @@ def _chunks_iterable(iterable, size: int):
 def upsert_embeddings(
     document_id: str,
     chunks: List[str],
-    embeddings: List[List[float]],
+    embeddings: List[Any],  # float32 numpy rows or lists of floats
     metadata: Optional[List[Dict[str, Any]]] = None,
     delete_existing: bool = True,
+    chunk_id_offset: int = 0,
 ) -> Dict[str, Any]:
     """
     Idempotently store embeddings for a document.
@@ -136,6 +211,10 @@ def upsert_embeddings(
     Steps:
     1) Optionally delete existing rows for this document_id (makes operation idempotent).
     2) Insert rows in batches. Each row has: document_id, chunk_id, chunk_text, embedding, metadata.
+
+    chunk_id_offset lets callers stream a document in several calls while
+    keeping globally consistent chunk ids (pass delete_existing=False after
+    the first call).
     """
     if len(chunks) != len(embeddings):
         raise ValueError("chunks and embeddings must have the same length")
@@ -145,23 +224,33 @@ def upsert_embeddings(
     if len(metadata) != n:
         raise ValueError("metadata length must match chunks length")
 
-    # Delete existing rows for this document (idempotency)
-    if delete_existing:
+    global _bulk_rpc_ok
+    use_bulk = USE_BULK_RPC and _bulk_rpc_ok
+    deleted = not delete_existing
+
+    def _delete_existing_rows():
         resp = supabase.table("embeddings").delete().eq("document_id", document_id).execute()
         err = _resp_has_error(resp)
         if err:
             raise RuntimeError(f"Failed to delete existing embeddings for document {document_id}: {err}")
 
+    # Delete existing rows for this document (idempotency). When the bulk RPC
+    # is in play the delete is folded into its first call instead, saving a
+    # round trip.
+    if not use_bulk and not deleted:
+        _delete_existing_rows()
+        deleted = True
+
     # Prepare rows
     rows = []
     for i, (chunk_text, emb, meta) in enumerate(zip(chunks, embeddings, metadata)):
-        emb_list = [float(x) for x in emb]  # ensure native floats
+        # rows serialize straight from their float32 buffers; no per-scalar pass
         rows.append(
             {
                 "document_id": document_id,
-                "chunk_id": i,
+                "chunk_id": chunk_id_offset + i,
                 "chunk_text": chunk_text,
-                "embedding": emb_list,
+                "embedding": _vector_value(emb),
                 "metadata": meta or {},
             }
         )
@@ -169,6 +258,37 @@ def upsert_embeddings(
     # Batch insert
     inserted = 0
     for batch in _chunks_iterable(rows, BATCH_SIZE):
+        if use_bulk:
+            try:
+                resp = supabase.rpc(
+                    "insert_embeddings_bulk",
+                    {
+                        "rows": batch,
+                        "replace_document": document_id if not deleted else None,
+                    },
+                ).execute()
+                err = _resp_has_error(resp)
+                if err:
+                    raise RuntimeError(err)
+            except Exception:
+                # RPC missing or failed; disable it for this process and
+                # retry this batch through the plain insert path below.
+                _bulk_rpc_ok = False
+                use_bulk = False
+                if not deleted:
+                    _delete_existing_rows()
+                    deleted = True
+            else:
+                deleted = True
+                data = _resp_get_data_list(resp)
+                if isinstance(data, int):
+                    inserted += data
+                elif isinstance(data, list):
+                    inserted += len(data)
+                else:
+                    inserted += len(batch)
+                continue
+
         resp = supabase.table("embeddings").insert(batch).execute()
         err = _resp_has_error(resp)
         if err:
@@ -189,16 +309,28 @@ def upsert_embeddings(
 # -----------------------------
 # query_similar
 # -----------------------------
-def query_similar(query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+def query_similar(
+    query_embedding: List[float],
+    top_k: int = 5,
+    filter_document: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
-    Query the DB for the top_k most similar chunks using the `match_vectors` RPC.
+    Query the DB for the top_k most similar chunks using the `match_vectors` RPC
+    (HNSW-indexed, see backend/db/match_vectors.sql).
+
+    filter_document restricts the search to one document_id, pruning rows
+    before the ANN scan.
 
     Returns:
         list of dicts: each dict contains keys returned by the RPC (id, document_id, chunk_id, chunk_text, score)
     """
     q_emb = [float(x) for x in query_embedding]
 
-    resp = supabase.rpc("match_vectors", {"query_embedding": q_emb, "match_count": top_k}).execute()
+    params: Dict[str, Any] = {"query_embedding": q_emb, "match_count": top_k}
+    if filter_document is not None:
+        params["filter_document"] = filter_document
+
+    resp = supabase.rpc("match_vectors", params).execute()
     err = _resp_has_error(resp)
     if err:
         raise RuntimeError(f"Supabase RPC match_vectors error: {err}")
@@ -208,3 +340,33 @@ def query_similar(query_embedding: List[float], top_k: int = 5) -> List[Dict[str
         # If nothing found, return empty list
         return []
     return data
+
+
+async def query_similar_async(
+    query_embedding: List[float],
+    top_k: int = 5,
+    filter_document: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async variant of query_similar for use inside the FastAPI event loop.
+
+    Posts straight to the PostgREST RPC endpoint with the shared
+    httpx.AsyncClient, so concurrent queries multiplex on the event loop
+    instead of each occupying a worker thread via asyncio.to_thread.
+    """
+    q_emb = [float(x) for x in query_embedding]
+
+    params: Dict[str, Any] = {"query_embedding": q_emb, "match_count": top_k}
+    if filter_document is not None:
+        params["filter_document"] = filter_document
+
+    resp = await _get_async_client().post("/rpc/match_vectors", json=params)
+    if resp.status_code >= 400:
+        raise RuntimeError(
+            f"Supabase RPC match_vectors error: status={resp.status_code} body={resp.text}"
+        )
+
+    data = resp.json()
+    if not isinstance(data, list):
+        return []
+    return data
@@ -0,0 +1,87 @@
+-- Optional migration: store embeddings as halfvec (fp16) instead of vector.
+--
+-- Halves storage and HNSW index memory (768 dims: 3 KB -> 1.5 KB per row)
+-- and with it the bandwidth of every ANN scan. Recall loss from fp16 is
+-- negligible for normalized sentence embeddings. Requires pgvector >= 0.7.
+--
+-- After running this, set SUPABASE_HALFVEC=1 in backend/.env so the client
+-- quantizes values to fp16 precision before sending (shorter literals too).
+
+-- Drop the vector_cosine_ops index before the type change: ALTER COLUMN TYPE
+-- rebuilds dependent indexes from their stored definitions, and that opclass
+-- cannot be rebuilt over a halfvec column, so the alter would abort.
+drop index if exists embeddings_embedding_hnsw_idx;
+
+alter table embeddings
+    alter column embedding type halfvec(768)
+    using embedding::halfvec(768);
+
+create index embeddings_embedding_hnsw_idx
+    on embeddings using hnsw (embedding halfvec_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- Drop the vector(768) signatures, not replace: create or replace with a
+-- different argument type adds an overload, and with both functions present
+-- every PostgREST match_vectors call fails as ambiguous. The old overloads
+-- are broken against the halfvec column anyway.
+drop function if exists match_vectors(vector(768), int, text);
+drop function if exists match_vectors(vector(768), int);
+
+create or replace function match_vectors(
+    query_embedding halfvec(768),
+    match_count int default 5,
+    filter_document text default null
+)
+returns table (
+    id bigint,
+    document_id text,
+    chunk_id int,
+    chunk_text text,
+    score float
+)
+language plpgsql
+as $$
+begin
+    set local hnsw.ef_search = 40;
+    return query
+    select
+        e.id,
+        e.document_id,
+        e.chunk_id,
+        e.chunk_text,
+        1 - (e.embedding <=> query_embedding) as score
+    from embeddings e
+    where filter_document is null or e.document_id = filter_document
+    order by e.embedding <=> query_embedding
+    limit match_count;
+end;
+$$;
+
+create or replace function insert_embeddings_bulk(
+    rows jsonb,
+    replace_document text default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+    inserted integer;
+begin
+    if replace_document is not null then
+        delete from embeddings where document_id = replace_document;
+    end if;
+
+    insert into embeddings (document_id, chunk_id, chunk_text, embedding, metadata)
+    select r.document_id, r.chunk_id, r.chunk_text, r.embedding, r.metadata
+    from jsonb_to_recordset(rows) as r(
+        document_id text,
+        chunk_id integer,
+        chunk_text text,
+        embedding halfvec(768),
+        metadata jsonb
+    );
+
+    get diagnostics inserted = row_count;
+    return inserted;
+end;
+$$;
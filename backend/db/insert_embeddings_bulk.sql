@@ -0,0 +1,39 @@
+-- insert_embeddings_bulk
+--
+-- Bulk ingestion function for the `embeddings` table. Accepts a JSONB array
+-- of rows and inserts them with one INSERT ... SELECT, so a 500-row batch is
+-- a single round trip instead of PostgREST row-by-row handling.
+--
+-- When replace_document is given, the old rows for that document are deleted
+-- in the same transaction (idempotent re-upload without an extra round trip).
+--
+-- Run this in the Supabase SQL editor (same place match_vectors was created).
+
+create or replace function insert_embeddings_bulk(
+    rows jsonb,
+    replace_document text default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+    inserted integer;
+begin
+    if replace_document is not null then
+        delete from embeddings where document_id = replace_document;
+    end if;
+
+    insert into embeddings (document_id, chunk_id, chunk_text, embedding, metadata)
+    select r.document_id, r.chunk_id, r.chunk_text, r.embedding, r.metadata
+    from jsonb_to_recordset(rows) as r(
+        document_id text,
+        chunk_id integer,
+        chunk_text text,
+        embedding vector(768),
+        metadata jsonb
+    );
+
+    get diagnostics inserted = row_count;
+    return inserted;
+end;
+$$;
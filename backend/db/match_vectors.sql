@@ -0,0 +1,48 @@
+-- match_vectors + ANN index
+--
+-- Server-side similarity search for the `embeddings` table. The HNSW index
+-- makes the ORDER BY embedding <=> query an approximate nearest-neighbour
+-- scan instead of a sequential read of every row; ef_search trades recall
+-- for latency per query. Rows are narrowed and limited in the database so
+-- the API never pulls wide result sets over the wire.
+--
+-- Run this in the Supabase SQL editor (same place the table was created).
+
+create index if not exists embeddings_embedding_hnsw_idx
+    on embeddings using hnsw (embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- The pre-existing 2-argument match_vectors must be dropped, not replaced:
+-- create or replace with a different signature would add an overload, and
+-- PostgREST RPC calls would then fail as ambiguous.
+drop function if exists match_vectors(vector(768), int);
+
+create or replace function match_vectors(
+    query_embedding vector(768),
+    match_count int default 5,
+    filter_document text default null
+)
+returns table (
+    id bigint,
+    document_id text,
+    chunk_id int,
+    chunk_text text,
+    score float
+)
+language plpgsql
+as $$
+begin
+    set local hnsw.ef_search = 40;
+    return query
+    select
+        e.id,
+        e.document_id,
+        e.chunk_id,
+        e.chunk_text,
+        1 - (e.embedding <=> query_embedding) as score
+    from embeddings e
+    where filter_document is null or e.document_id = filter_document
+    order by e.embedding <=> query_embedding
+    limit match_count;
+end;
+$$;